@@ -2,38 +2,73 @@ import csv
 import json
 import os
 
+try:
+    # orjson is much faster than the standard library encoder; it is optional
+    import orjson
+except ImportError:
+    orjson = None
+
+def _dumps(value):
+    # Encode a single JSON value, keeping Lao characters unescaped
+    if orjson is not None:
+        return orjson.dumps(value).decode('utf-8')
+    return json.dumps(value, ensure_ascii=False)
+
+def write_sentences_json(sentences, json_file):
+    """
+    Streams (sentence_id, text) pairs into json_file as {"sentences": [...]},
+    one record at a time, using the same 2-space layout as json.dump(indent=2).
+    Returns the number of sentences written.
+    """
+    count = 0
+    json_file.write('{\n  "sentences": [')
+    for sentence_id, text in sentences:
+        json_file.write(
+            (',\n' if count else '\n')
+            + '    {\n      "id": ' + _dumps(sentence_id)
+            + ',\n      "text": ' + _dumps(text)
+            + '\n    }'
+        )
+        count += 1
+    json_file.write('\n  ]\n}' if count else ']\n}')
+    return count
+
 def convert_csv_to_json(csv_file_path, output_json_path):
     # Ensure output directory exists
     os.makedirs(os.path.dirname(output_json_path), exist_ok=True)
 
-    sentences = []
+    # Write to a temporary file first so a failed run never leaves a truncated JSON behind
+    temp_json_path = output_json_path + '.tmp'
 
     try:
         # Open with UTF-8 encoding to properly handle Lao characters
-        with open(csv_file_path, 'r', encoding='utf-8-sig') as csv_file:
+        with open(csv_file_path, 'r', encoding='utf-8-sig') as csv_file, \
+                open(temp_json_path, 'w', encoding='utf-8', buffering=1 << 20) as json_file:
             # Assuming your CSV has headers 'sentence_id' and 'transcription'
-            reader = csv.DictReader(csv_file)
-
-            for row in reader:
-                # Clean up any whitespace
-                sentence_id = row['sentence_id'].strip()
-                text = row['transcription'].strip()
-
-                if sentence_id and text:
-                    sentences.append({
-                        "id": sentence_id,
-                        "text": text
-                    })
+            reader = csv.reader(csv_file)
+            # Resolve the column positions once instead of building a dict per row
+            headers = next(reader, [])
+            id_index = headers.index('sentence_id')
+            text_index = headers.index('transcription')
+            row_width = max(id_index, text_index) + 1
 
-        # Write to JSON file
-        with open(output_json_path, 'w', encoding='utf-8') as json_file:
-            json.dump({"sentences": sentences}, json_file, ensure_ascii=False, indent=2)
+            # Clean up any whitespace, then keep only rows with both fields set.
+            # Short rows are missing a field, so they are dropped like blank ones.
+            # Rows are written out as they are read, so memory use stays flat.
+            rows = ((row[id_index].strip(), row[text_index].strip()) for row in reader if len(row) >= row_width)
+            count = write_sentences_json(
+                ((sentence_id, text) for sentence_id, text in rows if sentence_id and text),
+                json_file,
+            )
 
-        print(f"Successfully converted {len(sentences)} sentences to {output_json_path}")
+        os.replace(temp_json_path, output_json_path)
+        print(f"Successfully converted {count} sentences to {output_json_path}")
         return True
 
     except Exception as e:
         print(f"Error converting CSV to JSON: {e}")
+        if os.path.exists(temp_json_path):
+            os.remove(temp_json_path)
         return False
 
 # Example usage
@@ -27,18 +27,24 @@ Arguments:
                  (Default: data_source/datatext.csv)
   --list_devices : List available audio input devices and exit.
   --device       : Numeric ID of the audio input device to use (optional).
+  --blocksize    : Audio frames delivered per callback (Default: 1024, i.e. 64 ms;
+                 at most 8000). 0 lets PortAudio choose (usually smaller, variable blocks).
 """
 
-import sounddevice as sd
-import soundfile as sf
-import numpy as np
+# sounddevice (which initialises PortAudio), soundfile and numpy are slow to
+# import, so they are imported by main() after the arguments are parsed (and by
+# list_audio_devices()); --help and argument errors then return immediately, and
+# --list_devices only loads sounddevice.
 import os
 import argparse
 import sys
-import queue
+import threading
 import time
 import csv
+import json
 import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Configuration ---
 SAMPLE_RATE = 16000  # Hertz (samples per second), standard for ASR
@@ -47,22 +53,91 @@ AUDIO_DTYPE = 'int16' # Data type for 16-bit audio
 RECORDINGS_BASE_DIR = 'recordings' # Base directory to save recordings
 # Default assumes your CSV is named 'datatext.csv' inside a 'data_source' folder
 DEFAULT_SENTENCES_FILE = os.path.join('data_source', 'datatext.csv')
-
-# --- Audio Queue (used by sounddevice callback) ---
-# Using a queue is the standard way to pass data from the audio callback thread
-audio_queue = queue.Queue()
+# Frames per audio callback. Recording is not monitored live, so large fixed
+# blocks are fine and keep the number of callbacks (and their overhead) low.
+DEFAULT_BLOCKSIZE = 1024 # 64 ms at 16 kHz
+# Recorded filenames end in _<SentenceID>.wav (e.g., C_SPK01_123.wav -> 123).
+# Matched against the lower-cased filename, so no IGNORECASE is needed.
+RECORDED_FILENAME_RE = re.compile(r'_(\d+)\.wav$')
+# Per-accent cache of recorded IDs (recordings/<accent>/.recorded_ids.json), so
+# speaker folders that have not changed since the last session are not rescanned
+RECORDED_IDS_CACHE_FILENAME = '.recorded_ids.json'
+RECORDED_IDS_CACHE_VERSION = 1
+# Folder modification times are only as fine as the filesystem's timestamps
+# (1 s on HFS+, 2 s on FAT32), so a file added within the same tick as a scan
+# can leave the mtime unchanged. Entries whose mtime is this close to the scan
+# are stored without one and rescanned by the next session.
+MTIME_SETTLE_NS = 2 * 10**9
+# Speaker folders needing a rescan are listed in parallel when there are more
+# than this many (directory listing is I/O-bound, e.g. on network drives)
+PARALLEL_SCAN_MIN_FOLDERS = 4
+PARALLEL_SCAN_WORKERS = 8
+RECORD_BUFFER_SECONDS = 10 # Audio held in memory while it waits to be written to disk
+SAVE_INTERVAL_SECONDS = 0.1 # How often the save thread writes new audio to the WAV file
+# Largest --blocksize accepted: a small fraction of the ring buffer, so one block
+# can never overrun audio the save thread has not written yet
+MAX_BLOCKSIZE = SAMPLE_RATE * RECORD_BUFFER_SECONDS // 20 # 8000 frames, 0.5 s
+# How close to a full ring buffer the save thread may fall behind before giving
+# up: one save interval of new audio plus one block still being copied in
+SAVE_LAG_MARGIN_FRAMES = int(SAMPLE_RATE * SAVE_INTERVAL_SECONDS) + MAX_BLOCKSIZE
+# Extra time allowed, on top of the input latency and one block, for the last
+# audio of a recording to arrive (some host APIs report no capture times, so
+# the callback cannot always tell when it has)
+STOP_MARGIN_SECONDS = 0.1
+
+sf = None # soundfile module, imported by main() at startup and used by the save thread
+
+# --- Recording Buffer (filled by sounddevice callback) ---
+# One ring buffer is allocated when the session starts and reused for every
+# sentence, so the callback only copies samples into place instead of
+# allocating per block. The save thread streams it to disk while recording, so
+# recordings can be of any length; the buffer only has to cover how far the
+# disk writes lag behind.
+record_buffer = None # Allocated by main() before the recording loop
+write_index = [0] # Frames delivered by the callback since the recording started
+# The input stream stays open for the whole session; audio is only kept while this is set
+recording_active = threading.Event()
+# Last non-empty stream status seen by the callback; reported from the main thread
+stream_status = [None]
+# Stream time at which the operator stopped the recording (None while recording).
+# Blocks captured before it are still kept, since they arrive up to the input
+# latency later; the callback sets recording_stopped at the first block after it.
+stop_time = [None]
+recording_stopped = threading.Event()
 
 # --- Audio Callback Function ---
 def audio_callback(indata, frames, time, status):
     """
     This function is called by sounddevice from a separate thread for each
     incoming audio block ('indata').
+    It runs on the real-time audio thread, so it must not block: stream
+    warnings are only recorded here and printed once recording has stopped.
+    Blocks arriving between recordings, or captured after the operator
+    stopped the recording, are discarded.
+    'indata' is only valid until the callback returns (PortAudio reuses that
+    memory for the next block), so it must never be stored: its samples are
+    copied straight into record_buffer, which is the only copy made.
     """
+    if not recording_active.is_set():
+        return
+    if stop_time[0] is not None and time.inputBufferAdcTime >= stop_time[0]:
+        # Everything captured before the operator pressed Enter has arrived
+        recording_stopped.set()
+        return
     if status:
-        # Report any issues encountered by the audio stream
-        print(f"Audio Stream Status Warning: {status}", file=sys.stderr)
-    # Add a copy of the audio data block to the queue
-    audio_queue.put(indata.copy())
+        # Remember any issues encountered by the audio stream
+        stream_status[0] = status
+    # Copy the block into the ring buffer, wrapping around at the end
+    capacity = len(record_buffer)
+    start = write_index[0] % capacity
+    end = start + frames
+    if end <= capacity:
+        record_buffer[start:end] = indata
+    else:
+        split = capacity - start
+        record_buffer[start:] = indata[:split]
+        record_buffer[:end - capacity] = indata[split:]
+    write_index[0] += frames
 
 # --- Helper Functions ---
 def load_sentences_from_csv(filepath):
@@ -77,23 +152,31 @@ def load_sentences_from_csv(filepath):
     try:
         # Use 'utf-8-sig' encoding to handle potential BOM (Byte Order Mark) from Excel CSVs
         with open(filepath, mode='r', encoding='utf-8-sig', newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            # print(reader)
+            reader = csv.reader(csvfile)
+            headers = next(reader, None) or []
 
             # Verify required headers are present
-            if not all(header in reader.fieldnames for header in required_headers):
-                print(f"Error: CSV file '{filepath}' is missing required headers.", file=sys.stderr)
+            found_headers = set(headers)
+            missing_headers = [header for header in required_headers if header not in found_headers]
+            if missing_headers:
+                print(f"Error: CSV file '{filepath}' is missing required headers: {missing_headers}", file=sys.stderr)
                 print(f"Required headers: {required_headers}", file=sys.stderr)
-                print(f"Found headers: {reader.fieldnames}", file=sys.stderr)
+                print(f"Found headers: {headers}", file=sys.stderr)
                 sys.exit(1)
 
+            # Resolve column positions once so rows can be indexed directly
+            id_index = headers.index('sentence_id')
+            text_index = headers.index('transcription')
+            row_width = max(id_index, text_index) + 1
+
             # Read each row
             for i, row in enumerate(reader):
-                # Use .get() for safety and .strip() to remove leading/trailing whitespace
-                sentence_id = row.get('sentence_id', '').strip()
-                text = row.get('transcription', '').strip()
-
-                # print(sentence_id, text)
+                # Pad short (or blank) rows so missing fields read as empty strings
+                if len(row) < row_width:
+                    row += [''] * (row_width - len(row))
+                # .strip() removes leading/trailing whitespace
+                sentence_id = row[id_index].strip()
+                text = row[text_index].strip()
 
                 # Ensure both ID and text are present before adding
                 if sentence_id and text:
@@ -124,10 +207,20 @@ def load_sentences_from_csv(filepath):
     print(f"Successfully loaded {len(sentences)} sentences.")
     return sentences
 
+def sentence_id_sort_key(sentence_id):
+    """
+    Sort key that orders numeric sentence IDs by value and places any
+    non-numeric IDs after them in string order, e.g. 2 < 10 < 'a1'.
+    """
+    if sentence_id.isdecimal():
+        return (0, int(sentence_id))
+    return (1, sentence_id)
+
 def list_audio_devices():
     """Lists available audio input devices with their IDs."""
     print("\nAvailable Audio Input Devices:")
     try:
+        import sounddevice as sd
         devices = sd.query_devices()
         input_devices_found = False
         for i, device in enumerate(devices):
@@ -147,11 +240,92 @@ def list_audio_devices():
     except Exception as e:
         print(f"Error querying audio devices: {e}", file=sys.stderr)
 
+def scan_speaker_recordings(speaker_dir_path):
+    """
+    Collects the sentence IDs from the valid .wav filenames in one speaker
+    directory. Returns a set of sentence IDs (strings).
+    Raises OSError if the directory cannot be read.
+    """
+    recorded_ids = set()
+    with os.scandir(speaker_dir_path) as file_entries:
+        for file_entry in file_entries:
+            # Lower-case once for both the extension check and the pattern
+            filename = file_entry.name.lower()
+            # Check if it's a WAV file matching the expected pattern
+            if filename.endswith('.wav'):
+                # Attempt to parse SentenceID from filename
+                match = RECORDED_FILENAME_RE.search(filename)
+                if match:
+                    sentence_id = match.group(1) # Extract the digits
+                    recorded_ids.add(sentence_id)
+                # You might add more robust parsing or checking here if needed
+    return recorded_ids
+
+def load_recorded_ids_cache(accent_recording_dir):
+    """
+    Reads the recorded-IDs cache of an accent directory.
+    Returns {speaker_folder: {'mtime_ns': ... or None, 'ids': set_of_ids}}, or an
+    empty dict if there is no usable cache.
+    """
+    cache_path = os.path.join(accent_recording_dir, RECORDED_IDS_CACHE_FILENAME)
+    try:
+        with open(cache_path, mode='r', encoding='utf-8') as cache_file:
+            cache = json.load(cache_file)
+        if cache.get('version') != RECORDED_IDS_CACHE_VERSION:
+            return {}
+        return {
+            speaker_folder: {'mtime_ns': entry['mtime_ns'], 'ids': set(entry['ids'])}
+            for speaker_folder, entry in cache['speakers'].items()
+        }
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        # Missing, unreadable or malformed cache: everything gets rescanned
+        return {}
+
+def save_recorded_ids_cache(accent_recording_dir, speakers):
+    """
+    Writes the recorded-IDs cache of an accent directory.
+    'speakers' has the same shape as returned by load_recorded_ids_cache.
+    """
+    cache_path = os.path.join(accent_recording_dir, RECORDED_IDS_CACHE_FILENAME)
+    cache = {
+        'version': RECORDED_IDS_CACHE_VERSION,
+        'speakers': {
+            speaker_folder: {'mtime_ns': entry['mtime_ns'], 'ids': sorted(entry['ids'])}
+            for speaker_folder, entry in speakers.items()
+        },
+    }
+    try:
+        # Write to a temporary file first so other sessions never read a half-written cache.
+        # The temporary name is unique per process, as sessions may share the accent folder.
+        temp_fd, temp_path = tempfile.mkstemp(dir=accent_recording_dir, prefix=RECORDED_IDS_CACHE_FILENAME + '.', suffix='.tmp')
+        try:
+            with open(temp_fd, mode='w', encoding='utf-8') as cache_file:
+                json.dump(cache, cache_file)
+            os.replace(temp_path, cache_path)
+        except BaseException:
+            try: os.remove(temp_path)
+            except OSError: pass
+            raise
+    except OSError as e:
+        print(f"Warning: Could not write recorded-IDs cache '{cache_path}': {e}", file=sys.stderr)
+
+def settled_mtime_ns(mtime_ns, scan_time_ns):
+    """
+    Returns the folder mtime to store in the cache for a folder listed after
+    scan_time_ns, or None if it is too recent to prove that no file was
+    added after the listing (the entry is then rescanned next time).
+    """
+    if mtime_ns < scan_time_ns - MTIME_SETTLE_NS:
+        return mtime_ns
+    return None
+
 def get_recorded_sentence_ids_for_accent(accent_recording_dir):
     """
     Scans all speaker subdirectories within the given accent directory
     and collects the sentence IDs from valid .wav filenames.
     Assumes filename format SpeakerID_SentenceID.wav
+    Speaker folders whose modification time matches the cached one are
+    taken from the cache instead of being listed again.
     Returns a set of recorded sentence IDs (strings).
     """
     recorded_ids = set()
@@ -162,32 +336,118 @@ def get_recorded_sentence_ids_for_accent(accent_recording_dir):
         print(f"Info: Accent directory '{accent_recording_dir}' not found. Assuming no prior recordings for this accent.")
         return recorded_ids # Return empty set
 
-    # Iterate through items in the accent directory (expecting speaker folders)
-    for speaker_id_folder in os.listdir(accent_recording_dir):
-        speaker_dir_path = os.path.join(accent_recording_dir, speaker_id_folder)
-
-        # Check if it's actually a directory
-        if os.path.isdir(speaker_dir_path):
-            # Iterate through files within the speaker directory
+    cache = load_recorded_ids_cache(accent_recording_dir)
+    # Taken before any folder is listed, see settled_mtime_ns
+    scan_time_ns = time.time_ns()
+    speakers = {}
+    stale_speakers = [] # (speaker_folder, speaker_dir_path, mtime_ns) that need a rescan
+
+    # Iterate through items in the accent directory (expecting speaker folders).
+    # os.scandir returns the entry type with each name, so no extra stat() per entry.
+    with os.scandir(accent_recording_dir) as speaker_entries:
+        for speaker_entry in speaker_entries:
+            # Check if it's actually a directory (a symlinked speaker folder counts too)
+            if not speaker_entry.is_dir():
+                continue
             try:
-                for filename in os.listdir(speaker_dir_path):
-                    # Check if it's a WAV file matching the expected pattern
-                    if filename.lower().endswith('.wav'):
-                        # Attempt to parse SentenceID from filename (e.g., C_SPK01_123.wav -> 123)
-                        # This regex looks for '_' followed by digits, followed by '.wav'
-                        match = re.search(r'_(\d+)\.wav$', filename, re.IGNORECASE)
-                        if match:
-                            sentence_id = match.group(1) # Extract the digits
-                            recorded_ids.add(sentence_id)
-                        # You might add more robust parsing or checking here if needed
+                # Adding or removing a file updates the folder's mtime, unless it
+                # lands in the same timestamp tick (see MTIME_SETTLE_NS)
+                mtime_ns = speaker_entry.stat().st_mtime_ns
             except OSError as e:
-                 print(f"Warning: Could not read directory {speaker_dir_path}: {e}", file=sys.stderr)
+                 print(f"Warning: Could not read directory {speaker_entry.path}: {e}", file=sys.stderr)
+                 continue
+            cached = cache.get(speaker_entry.name)
+            if cached is not None and cached['mtime_ns'] == mtime_ns:
+                speakers[speaker_entry.name] = cached
+            else:
+                stale_speakers.append((speaker_entry.name, speaker_entry.path, mtime_ns))
+
+    # Iterate through files within the speaker directories that changed
+    if len(stale_speakers) > PARALLEL_SCAN_MIN_FOLDERS:
+        with ThreadPoolExecutor(max_workers=PARALLEL_SCAN_WORKERS) as scan_executor:
+            scans = [scan_executor.submit(scan_speaker_recordings, speaker_dir_path)
+                     for _, speaker_dir_path, _ in stale_speakers]
+    else:
+        scans = None
+    for index, (speaker_folder, speaker_dir_path, mtime_ns) in enumerate(stale_speakers):
+        try:
+            if scans is not None:
+                speaker_ids = scans[index].result()
+            else:
+                speaker_ids = scan_speaker_recordings(speaker_dir_path)
+        except OSError as e:
+             print(f"Warning: Could not read directory {speaker_dir_path}: {e}", file=sys.stderr)
+             continue
+        speakers[speaker_folder] = {'mtime_ns': settled_mtime_ns(mtime_ns, scan_time_ns), 'ids': speaker_ids}
+
+    for entry in speakers.values():
+        recorded_ids |= entry['ids']
+
+    if speakers != cache:
+        save_recorded_ids_cache(accent_recording_dir, speakers)
 
     print(f"Found {len(recorded_ids)} previously recorded sentence IDs for this accent.")
     return recorded_ids
 
+def update_recorded_ids_cache(accent_recording_dir, speaker_folder):
+    """
+    Refreshes the cached entry of one speaker folder (the one a session just
+    recorded into), so the next session can reuse it without a rescan.
+    The folder is only listed again if its modification time has changed.
+    """
+    speaker_dir_path = os.path.join(accent_recording_dir, speaker_folder)
+    cache = load_recorded_ids_cache(accent_recording_dir)
+    scan_time_ns = time.time_ns()
+    try:
+        # Follows symlinks, like the DirEntry.stat() in the accent scan
+        mtime_ns = os.stat(speaker_dir_path).st_mtime_ns
+        cached = cache.get(speaker_folder)
+        if cached is not None and cached['mtime_ns'] == mtime_ns:
+            return
+        cache[speaker_folder] = {'mtime_ns': settled_mtime_ns(mtime_ns, scan_time_ns),
+                                 'ids': scan_speaker_recordings(speaker_dir_path)}
+    except OSError as e:
+        print(f"Warning: Could not read directory {speaker_dir_path}: {e}", file=sys.stderr)
+        return
+    save_recorded_ids_cache(accent_recording_dir, cache)
+
+def save_recording(output_filepath):
+    """
+    Runs on the save thread for the duration of one recording. Writes the
+    audio gathered in record_buffer to a 16-bit PCM WAV file as it arrives,
+    in one large write per interval, until recording_active is cleared.
+    Returns the number of frames written.
+    """
+    capacity = len(record_buffer)
+    frames_written = 0
+    with sf.SoundFile(output_filepath, mode='w', samplerate=SAMPLE_RATE,
+                      channels=CHANNELS, subtype='PCM_16') as sound_file:
+        while True:
+            # Check the flag before reading the index, so the last pass picks up
+            # every block delivered before recording stopped
+            still_recording = recording_active.is_set()
+            frames_available = write_index[0]
+            # The callback keeps filling the ring while this pass writes, so leave
+            # room for one interval of new audio plus a block being copied in
+            if frames_available - frames_written > capacity - SAVE_LAG_MARGIN_FRAMES:
+                raise RuntimeError(f"Writing audio to disk fell too far behind the recording (buffer holds {RECORD_BUFFER_SECONDS} seconds)")
+            while frames_written < frames_available:
+                start = frames_written % capacity
+                end = min(capacity, start + frames_available - frames_written)
+                sound_file.buffer_write(record_buffer[start:end], dtype=AUDIO_DTYPE)
+                # If the callback wrapped around onto this slice (counting a block
+                # that may still be mid-copy) before it was written, the file is corrupt
+                if write_index[0] + MAX_BLOCKSIZE - frames_written > capacity:
+                    raise RuntimeError("Audio was overwritten before it could be written to disk")
+                frames_written += end - start
+            if not still_recording:
+                return frames_written
+            time.sleep(SAVE_INTERVAL_SECONDS)
+
 # --- Main Execution Block ---
 def main():
+    global record_buffer, sf
+
     # --- Argument Parsing ---
     parser = argparse.ArgumentParser(
         description="Record audio sentences for an ASR dataset (Shared Accent Progress).",
@@ -203,14 +463,25 @@ def main():
                         help="List available audio input devices and exit.")
     parser.add_argument('--device', type=int,
                         help="Numeric ID of the audio input device to use (optional, uses default if omitted).")
+    parser.add_argument('--blocksize', type=int, default=DEFAULT_BLOCKSIZE,
+                        help=f"Audio frames per callback (default: {DEFAULT_BLOCKSIZE}, max: {MAX_BLOCKSIZE}; 0 lets PortAudio choose).")
 
     args = parser.parse_args()
+    if not 0 <= args.blocksize <= MAX_BLOCKSIZE:
+        parser.error(f"--blocksize must be between 0 and {MAX_BLOCKSIZE} frames.")
+
+    import sounddevice as sd
 
     # --- Handle --list_devices Action ---
     if args.list_devices:
         list_audio_devices()
         sys.exit(0)
 
+    # Imported here rather than on the save thread, so a missing libsndfile is
+    # reported at startup instead of after the first take
+    import soundfile as sf
+    import numpy as np
+
     # --- Audio Device Setup ---
     selected_device_info = "Default System Input Device"
     if args.device is not None:
@@ -245,53 +516,92 @@ def main():
 
     # --- Load Sentences ---
     sentences = load_sentences_from_csv(args.sentences_file)
-    # Get sentence IDs from the dictionary keys and sort them numerically if possible
-    sentence_ids = sorted(sentences.keys(), key=lambda x: int(x) if x.isdigit() else x)
+    # Get sentence IDs from the dictionary keys and sort them numerically if possible.
+    # The usual all-numeric case sorts on plain ints; mixed IDs need the tuple key.
+    if all(sentence_id.isdecimal() for sentence_id in sentences):
+        sentence_ids = sorted(sentences, key=int)
+    else:
+        sentence_ids = sorted(sentences, key=sentence_id_sort_key)
     total_sentences = len(sentence_ids)
     session_recorded_count = 0
-    session_skipped_count = 0 # Counts sentences skipped because *any* speaker in the accent did them
 
     # --- Get IDs already recorded by ANY speaker in this accent group ---
     # This function needs to be defined elsewhere in your script
     already_recorded_accent_ids = get_recorded_sentence_ids_for_accent(accent_recording_dir)
     # --------------------------------------------------------------------
 
+    # Work out up front which sentences still need recording, instead of
+    # stepping through (and announcing) every already-recorded one in the loop
+    pending_sentence_ids = [sentence_id for sentence_id in sentence_ids
+                            if sentence_id not in already_recorded_accent_ids]
+    total_pending = len(pending_sentence_ids)
+    session_skipped_count = total_sentences - total_pending # Skipped because *any* speaker in the accent did them
+
     # --- Display Instructions ---
-    print("\n--- Recording Session Start ---")
-    print(f"Speaker: {args.speaker_id} | Accent: {args.accent}")
-    print(f"Total sentences in file: {total_sentences}")
-    print(f"Sentences already recorded for accent '{args.accent}': {len(already_recorded_accent_ids)}")
-    print("\nInstructions for the OPERATOR:")
-    print("  1. The sentence to be read will be displayed.")
-    print("  2. Ensure the speaker is ready.")
-    print("  3. Press ENTER to start recording.")
-    print("  4. After the speaker finishes reading, press ENTER again to stop.")
-    print("  5. To quit the session early, type 'q' and press Enter instead of starting a recording.")
-    print("\nInstructions for the SPEAKER:")
-    print("  1. Wait for the 'RECORDING NOW' message.")
-    print("  2. Read the displayed sentence clearly and at a natural pace.")
-    print("  3. Wait for the 'Recording stopped' message before the next sentence.")
-    print("-" * 40)
+    # Written in one go rather than one print() (and terminal write) per line
+    sys.stdout.write("\n".join([
+        "\n--- Recording Session Start ---",
+        f"Speaker: {args.speaker_id} | Accent: {args.accent}",
+        f"Total sentences in file: {total_sentences}",
+        f"Sentences already recorded for accent '{args.accent}': {len(already_recorded_accent_ids)}",
+        f"Sentences left to record: {total_pending} (skipping {session_skipped_count} already recorded)",
+        "\nInstructions for the OPERATOR:",
+        "  1. The sentence to be read will be displayed.",
+        "  2. Ensure the speaker is ready.",
+        "  3. Press ENTER to start recording.",
+        "  4. After the speaker finishes reading, press ENTER again to stop.",
+        "  5. To quit the session early, type 'q' and press Enter instead of starting a recording.",
+        "\nInstructions for the SPEAKER:",
+        "  1. Wait for the 'RECORDING NOW' message.",
+        "  2. Read the displayed sentence clearly and at a natural pace.",
+        "  3. Wait for the 'Recording stopped' message before the next sentence.",
+        "-" * 40,
+    ]) + "\n")
+    sys.stdout.flush()
     time.sleep(3) # Pause for instructions to be read
 
     # --- Main Recording Loop ---
-    current_stream = None # Keep track of the current audio stream
+    record_buffer = np.empty((SAMPLE_RATE * RECORD_BUFFER_SECONDS, CHANNELS), dtype=AUDIO_DTYPE)
+    current_stream = None # Keep track of the session's audio stream
+    # WAV files are written on a background thread while the speaker reads, so
+    # only the last fraction of a second is left to write once recording stops
+    save_executor = ThreadPoolExecutor(max_workers=1)
+    pending_save = None # (future, output_filepath) of the recording being saved
     try:
-        for i, sentence_id in enumerate(sentence_ids):
+        # Open and start the audio input stream once for the whole session.
+        # Opening a PortAudio stream negotiates with the device, so doing it per
+        # sentence adds a noticeable delay; instead the callback is gated by
+        # recording_active and simply drops audio between recordings.
+        current_stream = sd.InputStream(
+            samplerate=SAMPLE_RATE,
+            channels=CHANNELS,
+            dtype=AUDIO_DTYPE,
+            blocksize=args.blocksize,
+            # latency is left at sounddevice's default, which for input is already
+            # 'high'; the audio still in flight when a recording stops is kept
+            # by the stop_time handshake rather than by a shorter latency
+            callback=audio_callback,
+            # device=args.device # sd.default should be set already if --device was used
+        )
+        current_stream.start()
+        # Longest wait for audio captured before Enter to come through the stream
+        stop_timeout = (current_stream.latency + (args.blocksize or DEFAULT_BLOCKSIZE) / SAMPLE_RATE
+                        + STOP_MARGIN_SECONDS)
+
+        # Every output file is <speaker_recording_dir>/<speaker_id>_<sentence_id>.wav,
+        # so the common part of the name and path is built once for the session
+        output_filename_prefix = args.speaker_id + "_"
+        output_filepath_prefix = os.path.join(speaker_recording_dir, output_filename_prefix)
+
+        for i, sentence_id in enumerate(pending_sentence_ids, 1):
             # Get the sentence text from the dictionary using the ID
             sentence_text = sentences[sentence_id]
             # Define the output filename (specific to current speaker and sentence)
-            output_filename = f"{args.speaker_id}_{sentence_id}.wav"
-            output_filepath = os.path.join(speaker_recording_dir, output_filename) # Full path to save file
+            output_filename = output_filename_prefix + sentence_id + ".wav"
+            output_filepath = output_filepath_prefix + sentence_id + ".wav" # Full path to save file
 
-            print(f"\n[{i+1}/{total_sentences}] Sentence ID: {sentence_id}")
-            # Check if this sentence ID was recorded by ANY speaker in the accent group
-            if sentence_id in already_recorded_accent_ids:
-                print(f"  --> Sentence ID {sentence_id} already recorded for accent '{args.accent}'. Skipping.")
-                session_skipped_count += 1
-                continue # Skips to the next sentence_id
-
-            # If not skipped, display the text to read
+            print(f"\n[{i}/{total_pending}] Sentence ID: {sentence_id}")
+            # Display the text to read
             print(f"  Text to Read: '{sentence_text}'")
 
             # Prompt operator to start or quit
@@ -301,22 +611,19 @@ def main():
                 break
 
             # --- Start Recording Process ---
-            # Clear the audio queue before starting a new recording
-            while not audio_queue.empty():
-                try:
-                    audio_queue.get_nowait()
-                except queue.Empty:
-                    break
-
-            # Create and start the audio input stream
-            current_stream = sd.InputStream(
-                samplerate=SAMPLE_RATE,
-                channels=CHANNELS,
-                dtype=AUDIO_DTYPE,
-                callback=audio_callback,
-                # device=args.device # sd.default should be set already if --device was used
-            )
-            current_stream.start()
+            # The stream stays open for the whole session, so a device that was
+            # unplugged (or a stream PortAudio aborted) has to be caught here
+            if not current_stream.active:
+                raise sd.PortAudioError("The audio input stream has stopped (was the device disconnected?)")
+            # Start filling the recording buffer from the beginning again
+            write_index[0] = 0
+            # Forget stream warnings left over from the previous recording
+            stream_status[0] = None
+            stop_time[0] = None
+            recording_stopped.clear()
+            recording_active.set()
+            # File is saved under the CURRENT speaker's ID and folder
+            pending_save = (save_executor.submit(save_recording, output_filepath), output_filepath)
             print("\n--- 🟡RECORDING NOW 🟡 ---")
             print("   (Operator: Press ENTER when speaker has finished reading)")
 
@@ -324,86 +631,112 @@ def main():
             input() # This blocks until Enter is pressed
 
             # --- Stop Recording Process ---
+            # Audio spoken just before Enter is still passing through the input
+            # latency, so keep recording until the callback sees a block captured
+            # after this moment (or the latency has certainly passed)
+            stop_time[0] = current_stream.time
+            recording_stopped.wait(stop_timeout)
+            recording_active.clear()
             print("--- Recording stopped. Processing audio... ---")
-            current_stream.stop()
-            current_stream.close()
-            current_stream = None # Clear the stream variable
-
-            # Retrieve all recorded audio data chunks from the queue
-            recording_chunks = []
-            while not audio_queue.empty():
-                try:
-                    recording_chunks.append(audio_queue.get_nowait())
-                except queue.Empty:
-                    break
-
-            if not recording_chunks:
-                 print("Warning: No audio data was captured for this sentence. Please check microphone.", file=sys.stderr)
-                 print("Skipping save for this sentence.")
-                 continue # Go to the next sentence
 
-            # Combine the chunks into a single NumPy array
-            audio_data = np.concatenate(recording_chunks, axis=0)
+            # Report any issues the audio stream flagged while recording
+            if stream_status[0]:
+                print(f"Audio Stream Status Warning: {stream_status[0]}", file=sys.stderr)
 
             # --- Save the Audio File ---
-            # File is saved under the CURRENT speaker's ID and folder
+            # Wait for the save thread to write the tail of the recording and close the file
+            save_future, _ = pending_save
+            pending_save = None
             try:
-                # Save as WAV file, explicitly specifying 16-bit PCM subtype
-                sf.write(output_filepath, audio_data, SAMPLE_RATE, subtype='PCM_16')
-                duration_seconds = len(audio_data) / SAMPLE_RATE
-                print(f"--> Successfully saved: '{output_filename}' ({duration_seconds:.2f} seconds)")
-                session_recorded_count += 1
-                # Add the newly recorded ID to our *in-memory* set for this session
-                # This prevents trying it again if loop somehow repeats, but the file
-                # system check at the start of the next run is the main progress mechanism.
-                already_recorded_accent_ids.add(sentence_id)
-                time.sleep(0.5) # Brief pause before the next prompt
-
+                frames_saved = save_future.result()
             except Exception as e:
                  print(f"Error saving audio file '{output_filepath}': {e}", file=sys.stderr)
                  print("Please check file permissions and disk space.")
+                 # Don't leave a partial file behind that would count as recorded
+                 try: os.remove(output_filepath)
+                 except OSError: pass
                  # Decide if you want to stop the whole session on a save error
                  break # Stop the session for safety
 
+            if not current_stream.active:
+                 # The stream died during the take, so the file is missing audio
+                 # (or has none) and must not count as recorded
+                 try: os.remove(output_filepath)
+                 except OSError: pass
+                 raise sd.PortAudioError("The audio input stream stopped during the recording (was the device disconnected?)")
+
+            if not frames_saved:
+                 print("Warning: No audio data was captured for this sentence. Please check microphone.", file=sys.stderr)
+                 print("Skipping save for this sentence.")
+                 try: os.remove(output_filepath)
+                 except OSError: pass
+                 continue # Go to the next sentence
+
+            duration_seconds = frames_saved / SAMPLE_RATE
+            print(f"--> Successfully saved: '{output_filename}' ({duration_seconds:.2f} seconds)")
+            session_recorded_count += 1
+            # Add the newly recorded ID to our *in-memory* set for this session
+            # This prevents trying it again if loop somehow repeats, but the file
+            # system check at the start of the next run is the main progress mechanism.
+            already_recorded_accent_ids.add(sentence_id)
+            time.sleep(0.5) # Brief pause before the next prompt
+
     # --- Error Handling ---
     except sd.PortAudioError as e:
         print(f"\nFatal Audio Device Error: {e}", file=sys.stderr)
         print("Please check microphone connection, system audio settings, and permissions.")
-        if current_stream:
-            try: current_stream.close()
-            except Exception: pass
         list_audio_devices()
         print("Exiting script due to audio error.")
         sys.exit(1)
     except KeyboardInterrupt:
         # Handle Ctrl+C gracefully
         print("\nSession interrupted by user (Ctrl+C). Exiting.")
-        if current_stream:
-            try: current_stream.close()
-            except Exception: pass
     except Exception as e:
         # Catch any other unexpected errors
         print(f"\nAn unexpected error occurred: {e}", file=sys.stderr)
+        # Consider adding more detailed error reporting here if needed
+    finally:
+        # Close the session's audio stream (this also stops it)
+        recording_active.clear()
         if current_stream:
             try: current_stream.close()
             except Exception: pass
-        # Consider adding more detailed error reporting here if needed
-    finally:
+
+        # A recording that was cut short (e.g. by Ctrl+C) is incomplete: let the
+        # save thread finish, then remove the partial file
+        if pending_save is not None:
+            save_future, partial_filepath = pending_save
+            try:
+                save_future.result()
+            except Exception:
+                pass
+            try: os.remove(partial_filepath)
+            except OSError: pass
+        save_executor.shutdown(wait=True)
+
+        # Remember this speaker's recordings for the next session's scan
+        # (nothing to update if no recording was saved)
+        if session_recorded_count:
+            update_recorded_ids_cache(accent_recording_dir, args.speaker_id)
+
         # --- Session Summary ---
         # This block executes whether the loop finished normally or was interrupted
-        print("\n--- Recording Session Summary ---")
-        print(f"Speaker: {args.speaker_id} | Accent: {args.accent}")
-        print(f"Total Sentences in File: {total_sentences}")
-        print(f"Sentences Recorded by THIS speaker in THIS Session: {session_recorded_count}")
-        print(f"Sentences Skipped (already done by ANY speaker in accent): {session_skipped_count}")
-        # Recalculate overall progress for the accent by rescanning the directory
-        # This gives the most accurate final count for the accent group
-        final_recorded_ids = get_recorded_sentence_ids_for_accent(accent_recording_dir)
-        total_recorded_for_accent = len(final_recorded_ids)
+        # Overall progress for the accent: the IDs found when the session started plus
+        # every sentence saved since (the set is updated after each successful save),
+        # so there is no need to rescan the recordings directory here
+        total_recorded_for_accent = len(already_recorded_accent_ids)
         remaining_for_accent = total_sentences - total_recorded_for_accent
-        print(f"Total Sentences Recorded for Accent '{args.accent}' (Cumulative): {total_recorded_for_accent}")
-        print(f"Sentences Remaining for Accent: {remaining_for_accent}")
-        print("-" * 40)
+        sys.stdout.write("\n".join([
+            "\n--- Recording Session Summary ---",
+            f"Speaker: {args.speaker_id} | Accent: {args.accent}",
+            f"Total Sentences in File: {total_sentences}",
+            f"Sentences Recorded by THIS speaker in THIS Session: {session_recorded_count}",
+            f"Sentences Skipped (already done by ANY speaker in accent): {session_skipped_count}",
+            f"Total Sentences Recorded for Accent '{args.accent}' (Cumulative): {total_recorded_for_accent}",
+            f"Sentences Remaining for Accent: {remaining_for_accent}",
+            "-" * 40,
+        ]) + "\n")
+        sys.stdout.flush()
 
 # --- Script Entry Point ---
 if __name__ == "__main__":